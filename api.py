@@ -3,52 +3,225 @@ RESTful API Backend for AWS Chatbot
 Built with FastAPI for high performance and automatic API documentation
 """
 
-from fastapi import FastAPI, HTTPException, Header
+from fastapi import FastAPI, HTTPException, Header, Depends, Response, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List, Dict
+from contextlib import AsyncExitStack, asynccontextmanager
+import asyncio
 import uuid
+import weakref
 from datetime import datetime
-from chatbot_aws import AWSChatbot
+from langchain_core.messages import AIMessage
+import redis.asyncio as redis
+from redis.exceptions import LockError, LockNotOwnedError, RedisError
+import orjson
+from botocore.exceptions import ClientError
+from chatbot_aws import (
+    AWSChatbot,
+    DynamoDBWriter,
+    create_dynamodb_client,
+    fetch_history,
+    get_bedrock_control_client,
+    get_chat_model
+)
+from semantic_cache import SemanticCache
 import os
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up the shared clients on startup and release them on shutdown"""
+    region = os.getenv("AWS_REGION", "us-east-1")
+    model_id = os.getenv("BEDROCK_MODEL_ID", "us.amazon.nova-pro-v1:0")
+    
+    # Build clients now so the first request doesn't pay for it
+    get_chat_model(region, model_id)
+    await get_ddb_writer(await get_ddb_client())
+    try:
+        await app.state.redis.ping()
+        redis_status = "connected"
+    except Exception as e:
+        redis_status = f"unavailable ({str(e)})"
+    
+    print("=" * 60)
+    print("AWS Bedrock Chatbot API Starting...")
+    print("=" * 60)
+    print(f"📍 Region: {region}")
+    print(f"🤖 Default Model: {model_id}")
+    print(f"💾 DynamoDB Table: {os.getenv('DYNAMODB_TABLE_NAME', 'ChatbotConversations')}")
+    print(f"🗄️  Redis: {redis_status}")
+    print("=" * 60)
+    print("💡 To change model: Edit BEDROCK_MODEL_ID in .env file")
+    print("📚 API Documentation:")
+    print("   - Swagger UI: http://localhost:8000/docs")
+    print("   - ReDoc: http://localhost:8000/redoc")
+    print("=" * 60)
+    
+    yield
+    
+    print("\n🛑 Shutting down API server...")
+    if app.state.ddb_writer is not None:
+        await app.state.ddb_writer.stop()
+    await app.state.aws_clients.aclose()
+    await app.state.redis.aclose()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="AWS Bedrock Chatbot API",
     description="RESTful API for conversational AI powered by AWS Bedrock and DynamoDB",
     version="1.0.0",
     docs_url="/docs",  # Swagger UI
-    redoc_url="/redoc"  # ReDoc
+    redoc_url="/redoc",  # ReDoc
+    lifespan=lifespan
 )
 
-# CORS configuration - adjust origins for production
+# CORS configuration - set CORS_ORIGINS to a comma-separated list of frontend origins
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # In production, specify your frontend domains
+    allow_origins=[
+        origin.strip()
+        for origin in os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
+        if origin.strip()
+    ],
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "DELETE"],
+    allow_headers=["Content-Type", "Authorization"],
 )
 
-# In-memory session storage (for stateful connections)
-# In production, use Redis or similar
-chatbot_sessions: Dict[str, AWSChatbot] = {}
+# Compress larger JSON responses (history pages, model lists); SSE streams are left alone
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+# Session storage - conversation state lives in Redis so any worker can serve any session.
+# Each session is a hash at sess:{16 raw bytes of the session UUID}: model_id, region, created_at,
+# messages (orjson role/content list of the context window), summary (of older
+# exchanges) and user_messages/ai_messages counters.
+SESSION_TTL = int(os.getenv("SESSION_TTL", "3600"))
+SESSION_KEY_PREFIX = b"sess:"
+app.state.redis = redis.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+
+
+def session_key(session_uuid: uuid.UUID) -> bytes:
+    """Redis key holding the state of a session"""
+    return SESSION_KEY_PREFIX + session_uuid.bytes
+
+
+# Session locks - a Redis lock at lock:{session UUID bytes} serializes the exchanges
+# of a session across workers and containers, so concurrent requests don't both
+# extend the same history. Requests in the same process queue on a local lock
+# first, so only one of them at a time polls Redis. Both waits share one
+# SESSION_LOCK_WAIT budget. Local locks are referenced by the requests using them
+# and vanish once none is.
+SESSION_LOCK_PREFIX = b"lock:"
+SESSION_LOCK_TIMEOUT = int(os.getenv("SESSION_LOCK_TIMEOUT", "300"))  # Longest an exchange may hold it
+SESSION_LOCK_WAIT = float(os.getenv("SESSION_LOCK_WAIT", "60"))  # Longest a request waits for it
+_local_session_locks = weakref.WeakValueDictionary()
+
+
+@asynccontextmanager
+async def session_lock(redis_client, session_uuid: uuid.UUID):
+    """
+    Hold the lock of a session from load_chatbot until save_chatbot
+    
+    Raises:
+        LockError: If the session stays busy for SESSION_LOCK_WAIT seconds
+    """
+    local_lock = _local_session_locks.get(session_uuid)
+    if local_lock is None:
+        local_lock = asyncio.Lock()
+        _local_session_locks[session_uuid] = local_lock
+    
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + SESSION_LOCK_WAIT
+    try:
+        async with asyncio.timeout_at(deadline):
+            await local_lock.acquire()
+    except TimeoutError:
+        raise LockError("Timed out waiting for the session lock") from None
+    
+    try:
+        lock = redis_client.lock(
+            SESSION_LOCK_PREFIX + session_uuid.bytes,
+            timeout=SESSION_LOCK_TIMEOUT,
+            blocking_timeout=max(deadline - loop.time(), 0)
+        )
+        if not await lock.acquire():
+            raise LockError("Timed out waiting for the session lock")
+        try:
+            yield
+        finally:
+            try:
+                await lock.release()
+            except LockNotOwnedError as e:
+                # The exchange outlived SESSION_LOCK_TIMEOUT - it still completed and was saved
+                print(f"Warning: Session lock expired before release: {str(e)}")
+    finally:
+        local_lock.release()
+
+
+async def get_redis():
+    """Return the shared Redis client"""
+    return app.state.redis
+
+
+# Optional semantic response cache (needs Redis Stack for vector search)
+if os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true":
+    app.state.semantic_cache = SemanticCache(app.state.redis)
+else:
+    app.state.semantic_cache = None
+
+
+async def get_semantic_cache():
+    """Return the semantic response cache, or None when it is disabled"""
+    return app.state.semantic_cache
+
+# Shared async AWS clients - created at startup (or on first use when the
+# lifespan doesn't run, e.g. under Mangum) and closed on shutdown
+app.state.aws_clients = AsyncExitStack()
+app.state.ddb_client = None
+app.state.ddb_writer = None
+_ddb_client_lock = asyncio.Lock()
+
+
+async def get_ddb_client():
+    """Return the shared aiobotocore DynamoDB client, creating it on first use"""
+    if app.state.ddb_client is None:
+        async with _ddb_client_lock:
+            if app.state.ddb_client is None:
+                app.state.ddb_client = await app.state.aws_clients.enter_async_context(
+                    create_dynamodb_client()
+                )
+    return app.state.ddb_client
+
+
+async def get_ddb_writer(ddb_client=Depends(get_ddb_client)):
+    """Return the shared write-behind DynamoDB writer, starting it on first use"""
+    if app.state.ddb_writer is None:
+        app.state.ddb_writer = DynamoDBWriter(ddb_client)
+        app.state.ddb_writer.start()
+    return app.state.ddb_writer
+
+
+MODELS_CACHE_TTL = int(os.getenv("MODELS_CACHE_TTL", "3600"))
+MODELS_FALLBACK_CACHE_TTL = 300  # Retry the real list sooner when Bedrock access fails
 
 
 # Pydantic models for request/response validation
 class ChatRequest(BaseModel):
     message: str = Field(..., description="User's message", min_length=1, max_length=5000)
-    session_id: Optional[str] = Field(None, description="Session ID for conversation continuity")
+    session_id: Optional[uuid.UUID] = Field(None, description="Session ID for conversation continuity")
     model_id: Optional[str] = Field(None, description="Override default Bedrock model")
     
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "message": "What is AWS Lambda?",
-                "session_id": "optional-session-id",
-                "model_id": "anthropic.claude-3-sonnet-20240229-v1:0"
-            }
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "message": "What is AWS Lambda?",
+            "session_id": "3f2b8c1e-9a4d-4e7f-b6a5-0c1d2e3f4a5b",
+            "model_id": "anthropic.claude-3-sonnet-20240229-v1:0"
         }
+    })
 
 
 class ChatResponse(BaseModel):
@@ -75,6 +248,11 @@ class HistoryItem(BaseModel):
     message_id: str
 
 
+class HistoryPage(BaseModel):
+    items: List[HistoryItem]
+    next: Optional[str] = Field(None, description="Cursor for the next (older) page")
+
+
 class HealthResponse(BaseModel):
     status: str
     service: str
@@ -95,7 +273,8 @@ async def root():
         "health": "/health",
         "endpoints": {
             "chat": "POST /chat",
-            "history": "GET /history/{session_id}",
+            "chat_stream": "POST /chat/stream",
+            "history": "GET /history/{session_id}?limit=&cursor=",
             "session": "GET /session/{session_id}",
             "sessions": "GET /sessions"
         }
@@ -114,42 +293,94 @@ async def health_check():
     )
 
 
+async def load_chatbot(request: ChatRequest, session_uuid: uuid.UUID, redis_client, ddb_writer, semantic_cache):
+    """
+    Rebuild the chatbot from the cached session state, or start a new session
+    
+    Call with the session's lock held, until the updated state is saved.
+    
+    Returns:
+        tuple: (chatbot, is_new_session)
+    """
+    state = await redis_client.hmget(
+        session_key(session_uuid),
+        ["region", "model_id", "messages", "summary"]
+    )
+    
+    if state[0] is not None:
+        region, model_id, messages, summary = state
+        chatbot = AWSChatbot(
+            aws_region=region.decode(),
+            model_id=model_id.decode(),
+            writer=ddb_writer,
+            cache=semantic_cache
+        )
+        chatbot.load_messages(orjson.loads(messages), summary.decode() if summary else "")
+    else:
+        # model_id=None falls back to the default model
+        chatbot = AWSChatbot(model_id=request.model_id, writer=ddb_writer, cache=semantic_cache)
+    chatbot.session_id = str(session_uuid)
+    
+    return chatbot, state[0] is None
+
+
+async def save_chatbot(redis_client, session_uuid: uuid.UUID, chatbot: AWSChatbot, is_new_session: bool):
+    """Write the state of a session back after one exchange and refresh its TTL"""
+    key = session_key(session_uuid)
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.hset(key, mapping={
+            "model_id": chatbot.model_id,
+            "region": chatbot.aws_region,
+            "messages": orjson.dumps(chatbot.export_messages()),
+            "summary": chatbot.summary
+        })
+        if is_new_session:
+            pipe.hset(key, "created_at", datetime.utcnow().isoformat())
+        pipe.hincrby(key, "user_messages", 1)
+        if isinstance(chatbot.messages[-1], AIMessage):
+            pipe.hincrby(key, "ai_messages", 1)
+        pipe.expire(key, SESSION_TTL)
+        await pipe.execute()
+
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(
+    request: ChatRequest,
+    ddb_writer=Depends(get_ddb_writer),
+    redis_client=Depends(get_redis),
+    semantic_cache=Depends(get_semantic_cache)
+):
     """
     Send a message to the chatbot and get a response
     
     - **message**: Your message to the AI
-    - **session_id**: Optional session ID to continue a conversation
+    - **session_id**: Optional session ID (UUID) to continue a conversation
     - **model_id**: Optional model override
     """
     try:
-        # Get or create chatbot instance
-        session_id = request.session_id or str(uuid.uuid4())
-        
-        if session_id in chatbot_sessions:
-            chatbot = chatbot_sessions[session_id]
-        else:
-            # Create new chatbot instance
-            if request.model_id:
-                chatbot = AWSChatbot(model_id=request.model_id)
-            else:
-                chatbot = AWSChatbot()  # Use default model
+        session_uuid = request.session_id or uuid.uuid4()
+        async with session_lock(redis_client, session_uuid):
+            chatbot, is_new_session = await load_chatbot(
+                request, session_uuid, redis_client, ddb_writer, semantic_cache
+            )
             
-            chatbot.session_id = session_id
-            chatbot_sessions[session_id] = chatbot
-        
-        # Get response
-        response_text = chatbot.chat_response(request.message)
+            # Get response
+            response_text = await chatbot.chat_response(request.message)
+            await save_chatbot(redis_client, session_uuid, chatbot, is_new_session)
         
         return ChatResponse(
             response=response_text,
-            session_id=session_id,
+            session_id=chatbot.session_id,
             model=chatbot.model_id,
             region=chatbot.aws_region,
             timestamp=datetime.utcnow().isoformat()
         )
         
+    except LockError:
+        raise HTTPException(
+            status_code=409,
+            detail="Session is busy with another request, please retry"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -157,76 +388,152 @@ async def chat(request: ChatRequest):
         )
 
 
-@app.get("/history/{session_id}", response_model=List[HistoryItem])
-async def get_history(session_id: str):
+@app.post("/chat/stream")
+async def chat_stream(
+    request: ChatRequest,
+    ddb_writer=Depends(get_ddb_writer),
+    redis_client=Depends(get_redis),
+    semantic_cache=Depends(get_semantic_cache)
+):
+    """
+    Send a message to the chatbot and stream the response as Server-Sent Events
+    
+    Each chunk arrives as `data: {"content": "..."}`. A final `done` event
+    carries the session_id, model, region and timestamp; an `error` event
+    carries a `detail` if the exchange fails.
+    """
+    session_uuid = request.session_id or uuid.uuid4()
+    
+    async def events():
+        try:
+            # Held for the whole stream so the session is only loaded once the
+            # previous exchange has been saved
+            async with session_lock(redis_client, session_uuid):
+                chatbot, is_new_session = await load_chatbot(
+                    request, session_uuid, redis_client, ddb_writer, semantic_cache
+                )
+                
+                async for chunk in chatbot.stream_response(request.message):
+                    yield b"data: " + orjson.dumps({"content": chunk}) + b"\n\n"
+                
+                await save_chatbot(redis_client, session_uuid, chatbot, is_new_session)
+        except LockError:
+            yield b"event: error\ndata: " + orjson.dumps({
+                "detail": "Session is busy with another request, please retry"
+            }) + b"\n\n"
+            return
+        except Exception as e:
+            yield b"event: error\ndata: " + orjson.dumps({
+                "detail": f"Error processing chat request: {str(e)}"
+            }) + b"\n\n"
+            return
+        
+        yield b"event: done\ndata: " + orjson.dumps({
+            "session_id": chatbot.session_id,
+            "model": chatbot.model_id,
+            "region": chatbot.aws_region,
+            "timestamp": datetime.utcnow().isoformat()
+        }) + b"\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Session-ID": str(session_uuid)}
+    )
+
+
+@app.get("/history/{session_id}", response_model=HistoryPage)
+async def get_history(
+    session_id: uuid.UUID,
+    limit: int = Query(50, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    ddb_client=Depends(get_ddb_client)
+):
     """
-    Get conversation history for a specific session
+    Get conversation history for a specific session, most recent page first
     
     - **session_id**: The session ID to retrieve history for
+    - **limit**: Maximum number of messages per page
+    - **cursor**: The `next` value of a previous page, to fetch older messages
     """
     try:
-        # Create a temporary chatbot instance to access DynamoDB
-        chatbot = AWSChatbot()
-        history = chatbot.get_conversation_history(session_id)
-        
-        return [
-            HistoryItem(
-                timestamp=item.get('Timestamp', ''),
-                role=item.get('Role', ''),
-                content=item.get('Content', ''),
-                message_id=item.get('MessageId', '')
-            )
-            for item in history
-        ]
-        
+        history, next_cursor = await fetch_history(
+            str(session_id),
+            os.getenv("DYNAMODB_TABLE_NAME", "ChatbotConversations"),
+            ddb_client,
+            limit=limit,
+            cursor=cursor
+        )
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid history cursor")
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error retrieving history: {str(e)}"
         )
+    
+    return {
+        "items": [
+            {
+                "timestamp": item.get('Timestamp', ''),
+                "role": item.get('Role', ''),
+                "content": item.get('Content', ''),
+                "message_id": item.get('MessageId', '')
+            }
+            for item in history
+        ],
+        "next": next_cursor
+    }
 
 
 @app.get("/session/{session_id}", response_model=SessionInfo)
-async def get_session_info(session_id: str):
+async def get_session_info(session_id: uuid.UUID, redis_client=Depends(get_redis)):
     """
     Get information about a specific session
     
     - **session_id**: The session ID to get information for
     """
-    if session_id not in chatbot_sessions:
+    state = await redis_client.hmget(
+        session_key(session_id),
+        ["region", "model_id", "user_messages", "ai_messages", "created_at"]
+    )
+    if state[0] is None:
         raise HTTPException(
             status_code=404,
             detail=f"Session {session_id} not found in active sessions"
         )
     
-    chatbot = chatbot_sessions[session_id]
-    summary = chatbot.get_session_summary()
+    region, model_id, user_messages, ai_messages, created_at = state
     
     return SessionInfo(
-        session_id=summary['session_id'],
-        region=summary['region'],
-        model=summary['model'],
-        user_messages=summary['user_messages'],
-        ai_messages=summary['ai_messages'],
-        created_at=datetime.utcnow().isoformat()
+        session_id=str(session_id),
+        region=region.decode(),
+        model=model_id.decode(),
+        user_messages=int(user_messages or 0),
+        ai_messages=int(ai_messages or 0),
+        created_at=created_at.decode()
     )
 
 
 @app.get("/sessions", response_model=List[str])
-async def list_active_sessions():
+async def list_active_sessions(redis_client=Depends(get_redis)):
     """Get list of active session IDs"""
-    return list(chatbot_sessions.keys())
+    prefix_len = len(SESSION_KEY_PREFIX)
+    return [
+        str(uuid.UUID(bytes=key[prefix_len:]))
+        async for key in redis_client.scan_iter(match=SESSION_KEY_PREFIX + b"*", count=1000)
+        if len(key) == prefix_len + 16
+    ]
 
 
 @app.delete("/session/{session_id}")
-async def delete_session(session_id: str):
+async def delete_session(session_id: uuid.UUID, redis_client=Depends(get_redis)):
     """
-    Delete a session from memory (doesn't delete from DynamoDB)
+    Delete a session from the session store (doesn't delete from DynamoDB)
     
     - **session_id**: The session ID to delete
     """
-    if session_id in chatbot_sessions:
-        del chatbot_sessions[session_id]
+    if await redis_client.delete(session_key(session_id)):
         return {"message": f"Session {session_id} deleted", "status": "success"}
     else:
         raise HTTPException(
@@ -236,19 +543,23 @@ async def delete_session(session_id: str):
 
 
 @app.post("/models/list")
-async def list_available_models():
-    """List available Bedrock models from AWS"""
+async def list_available_models(redis_client=Depends(get_redis)):
+    """List available Bedrock models from AWS (cached in Redis)"""
+    region = os.getenv("AWS_REGION", "us-east-1")
+    cache_key = f"bedrock:models:{region}"
+    # The cache is optional here - if Redis is unavailable, ask Bedrock directly
+    try:
+        cached = await redis_client.get(cache_key)
+    except RedisError as e:
+        print(f"Warning: Could not read the model list cache: {str(e)}")
+        cached = None
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+    
     try:
-        import boto3
-        from botocore.exceptions import ClientError
-        
-        bedrock = boto3.client(
-            'bedrock',
-            region_name=os.getenv("AWS_REGION", "us-east-1")
-        )
-        
         # Get available models from AWS Bedrock
-        response = bedrock.list_foundation_models()
+        bedrock = get_bedrock_control_client(region)
+        response = await run_in_threadpool(bedrock.list_foundation_models)
         
         models = []
         for model in response.get('modelSummaries', []):
@@ -266,16 +577,17 @@ async def list_available_models():
         # Sort by provider and name
         models.sort(key=lambda x: (x['provider'], x['name']))
         
-        return {
+        payload = {
             "models": models,
             "count": len(models),
             "current_default": os.getenv("BEDROCK_MODEL_ID", "us.amazon.nova-pro-v1:0"),
             "note": "Use models with 'TEXT' in output_modalities for chat"
         }
+        ttl = MODELS_CACHE_TTL
         
     except ClientError as e:
         # Fallback to common models if can't access Bedrock
-        return {
+        payload = {
             "models": [
                 {
                     "id": "us.amazon.nova-pro-v1:0",
@@ -298,11 +610,19 @@ async def list_available_models():
             "current_default": os.getenv("BEDROCK_MODEL_ID", "us.amazon.nova-pro-v1:0"),
             "note": "Limited list - enable full access in AWS Bedrock console. Use region-prefixed model IDs (us., eu., etc.)"
         }
+        ttl = MODELS_FALLBACK_CACHE_TTL
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error listing models: {str(e)}"
         )
+    
+    content = orjson.dumps(payload)
+    try:
+        await redis_client.set(cache_key, content, ex=ttl)
+    except RedisError as e:
+        print(f"Warning: Could not cache the model list: {str(e)}")
+    return Response(content=content, media_type="application/json")
 
 
 # Error handlers
@@ -324,40 +644,22 @@ async def internal_error_handler(request, exc):
     }
 
 
-# Startup event
-@app.on_event("startup")
-async def startup_event():
-    """Run on application startup"""
-    print("=" * 60)
-    print("AWS Bedrock Chatbot API Starting...")
-    print("=" * 60)
-    print(f"📍 Region: {os.getenv('AWS_REGION', 'us-east-1')}")
-    print(f"🤖 Default Model: {os.getenv('BEDROCK_MODEL_ID', 'us.amazon.nova-pro-v1:0')}")
-    print(f"💾 DynamoDB Table: {os.getenv('DYNAMODB_TABLE_NAME', 'ChatbotConversations')}")
-    print("=" * 60)
-    print("💡 To change model: Edit BEDROCK_MODEL_ID in .env file")
-    print("📚 API Documentation:")
-    print("   - Swagger UI: http://localhost:8000/docs")
-    print("   - ReDoc: http://localhost:8000/redoc")
-    print("=" * 60)
-
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Run on application shutdown"""
-    print("\n🛑 Shutting down API server...")
-    # Clean up resources if needed
-
-
 if __name__ == "__main__":
+    import sys
     import uvicorn
     
+    reload = os.getenv("API_RELOAD", "false").lower() == "true"
+    
     # Run the API server
     uvicorn.run(
         "api:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,  # Auto-reload on code changes
-        log_level="info"
+        loop="asyncio" if sys.platform == "win32" else "uvloop",  # uvloop has no Windows build
+        http="httptools",
+        workers=1 if reload else int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        limit_concurrency=int(os.getenv("LIMIT_CONCURRENCY", "200")),  # Per-worker cap on open requests
+        reload=reload,  # Set API_RELOAD=true to auto-reload on code changes
+        log_level="warning"
     )
 
@@ -6,9 +6,18 @@ Uses AWS Bedrock for LLM and DynamoDB for conversation history storage
 import os
 import json
 import uuid
+import base64
+import asyncio
+import threading
+from contextlib import AsyncExitStack
+from functools import lru_cache
 from datetime import datetime
 from dotenv import load_dotenv
+from cachetools import TTLCache, cached
+import orjson
 import boto3
+from aiobotocore.session import get_session
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from langchain_aws import ChatBedrock
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
@@ -16,13 +25,236 @@ from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 # Load environment variables
 load_dotenv()
 
+# Shared aiobotocore session - clients created from it are reused across requests
+aws_session = get_session()
+
+# Message types keyed by the role names stored in DynamoDB / session state
+MESSAGE_TYPES = {"user": HumanMessage, "assistant": AIMessage}
+
+SYSTEM_PROMPT = "You are a helpful AI assistant powered by AWS. Be concise and friendly."
+SUMMARY_PROMPT = (
+    "Progressively summarize the conversation, adding onto the current summary "
+    "and returning a new summary. Keep every fact the assistant needs to continue "
+    "the conversation. Reply with the summary only."
+)
+
+
+# Keep-alive connection pool shared by every session using a client
+CLIENT_CONFIG = Config(
+    tcp_keepalive=True,
+    max_pool_connections=64,
+    retries={'mode': 'adaptive'}
+)
+
+
+@lru_cache(maxsize=None)
+def get_bedrock_client(aws_region):
+    """Shared bedrock-runtime client for a region"""
+    return boto3.client('bedrock-runtime', region_name=aws_region, config=CLIENT_CONFIG)
+
+
+@lru_cache(maxsize=None)
+def get_bedrock_control_client(aws_region):
+    """Shared bedrock (control plane) client for a region"""
+    return boto3.client('bedrock', region_name=aws_region, config=CLIENT_CONFIG)
+
+
+# model_id comes from API requests, so the chat model cache is bounded
+_chat_models = TTLCache(
+    maxsize=int(os.getenv("CHAT_MODEL_CACHE_SIZE", "32")),
+    ttl=int(os.getenv("CHAT_MODEL_CACHE_TTL", "3600"))
+)
+
+
+@cached(_chat_models, lock=threading.Lock())
+def get_chat_model(aws_region, model_id):
+    """Shared ChatBedrock for a region/model - it holds no conversation state"""
+    return ChatBedrock(
+        client=get_bedrock_client(aws_region),
+        model_id=model_id,
+        model_kwargs={
+            "temperature": 0.7,
+            "max_tokens": 2048,
+        }
+    )
+
+
+def create_dynamodb_client(aws_region=None):
+    """
+    Create an async DynamoDB client context manager
+    
+    Enter it once (e.g. with an AsyncExitStack) and share the client,
+    rather than creating a new client per request.
+    """
+    return aws_session.create_client(
+        'dynamodb',
+        region_name=aws_region or os.getenv("AWS_REGION", "us-east-1")
+    )
+
+
+def _decode_item(item):
+    """
+    Convert a DynamoDB-typed message item to a plain dict
+    
+    Every attribute of the conversation table is a string, so this skips
+    boto3's generic TypeDeserializer.
+    """
+    return {k: v['S'] for k, v in item.items()}
+
+
+async def fetch_history(session_id, table_name, ddb_client, limit=50, cursor=None):
+    """
+    Query one page of the stored messages of a session, newest page first
+    
+    Args:
+        session_id: Session to read
+        table_name: DynamoDB table name
+        ddb_client: Shared aiobotocore DynamoDB client
+        limit: Maximum number of messages to return
+        cursor: Opaque cursor from a previous call to fetch older messages
+        
+    Returns:
+        tuple: (messages in chronological order, cursor for the next page or None)
+        
+    Raises:
+        ValueError: If the cursor is malformed or belongs to another session
+    """
+    params = {
+        'TableName': table_name,
+        'KeyConditionExpression': 'SessionId = :sid',
+        'ExpressionAttributeValues': {':sid': {'S': session_id}},
+        'ProjectionExpression': '#ts, #r, Content, MessageId',
+        'ExpressionAttributeNames': {'#ts': 'Timestamp', '#r': 'Role'},
+        'Limit': limit,
+        'ScanIndexForward': False
+    }
+    if cursor:
+        start_key = orjson.loads(base64.urlsafe_b64decode(cursor))
+        if (
+            not isinstance(start_key, dict)
+            or start_key.keys() != {'SessionId', 'Timestamp'}
+            or start_key['SessionId'] != {'S': session_id}
+            or not isinstance(start_key['Timestamp'], dict)
+            or start_key['Timestamp'].keys() != {'S'}
+            or not isinstance(start_key['Timestamp']['S'], str)
+        ):
+            raise ValueError("Invalid history cursor")
+        params['ExclusiveStartKey'] = start_key
+    
+    response = await ddb_client.query(**params)
+    
+    items = [_decode_item(item) for item in reversed(response.get('Items', []))]
+    last_key = response.get('LastEvaluatedKey')
+    next_cursor = base64.urlsafe_b64encode(orjson.dumps(last_key)).decode() if last_key else None
+    
+    return items, next_cursor
+
+
+class DynamoDBWriter:
+    """
+    Write-behind buffer for conversation messages
+    
+    Messages are queued and persisted by a background task with
+    BatchWriteItem, so callers never wait on DynamoDB.
+    """
+    
+    MAX_BATCH_SIZE = 25  # BatchWriteItem limit
+    
+    def __init__(self, ddb_client, dynamodb_table=None, flush_interval=None):
+        """
+        Initialize the writer
+        
+        Args:
+            ddb_client: Shared aiobotocore DynamoDB client
+            dynamodb_table: DynamoDB table name (defaults to env var DYNAMODB_TABLE_NAME or ChatbotConversations)
+            flush_interval: Max seconds to wait for a batch to fill (defaults to env var DYNAMODB_FLUSH_INTERVAL or 0.2)
+        """
+        self.ddb_client = ddb_client
+        self.dynamodb_table = dynamodb_table or os.getenv("DYNAMODB_TABLE_NAME", "ChatbotConversations")
+        if flush_interval is None:
+            flush_interval = float(os.getenv("DYNAMODB_FLUSH_INTERVAL", "0.2"))
+        self.flush_interval = flush_interval
+        self.queue = asyncio.Queue()
+        self._task = None
+    
+    def start(self):
+        """Start the background flush task on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    def put(self, item):
+        """Queue a DynamoDB-typed item for writing"""
+        self.queue.put_nowait(item)
+    
+    async def flush(self):
+        """Wait until every queued item has been written"""
+        if self._task is not None:
+            await self.queue.join()
+    
+    async def stop(self):
+        """Flush pending items and stop the background task"""
+        if self._task is not None:
+            await self.flush()
+            self._task.cancel()
+            self._task = None
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.flush_interval
+            
+            # Fill the batch with whatever is already queued, then wait briefly for more
+            while len(batch) < self.MAX_BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                await self._write_batch(batch)
+            except ClientError as e:
+                print(f"Warning: Could not save {len(batch)} messages to DynamoDB: {e.response['Error']['Message']}")
+            except Exception as e:
+                print(f"Warning: DynamoDB error: {str(e)}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+    
+    async def _write_batch(self, items, max_attempts=5):
+        """Write items with BatchWriteItem, retrying unprocessed items with backoff"""
+        request_items = {
+            self.dynamodb_table: [{'PutRequest': {'Item': item}} for item in items]
+        }
+        for attempt in range(max_attempts):
+            response = await self.ddb_client.batch_write_item(RequestItems=request_items)
+            request_items = response.get('UnprocessedItems')
+            if not request_items:
+                return
+            await asyncio.sleep(0.05 * 2 ** attempt)
+        raise RuntimeError(f"{len(request_items[self.dynamodb_table])} messages left unprocessed")
+
+
 class AWSChatbot:
     """AWS Bedrock-powered chatbot with DynamoDB conversation storage"""
     
     def __init__(self, 
                  aws_region=None,
                  model_id=None,
-                 dynamodb_table=None):
+                 dynamodb_table=None,
+                 ddb_client=None,
+                 writer=None,
+                 cache=None,
+                 max_turns=None,
+                 summary_model_id=None):
         """
         Initialize AWS Chatbot
         
@@ -30,76 +262,69 @@ class AWSChatbot:
             aws_region: AWS region (defaults to env var AWS_REGION or us-east-1)
             model_id: Bedrock model ID (defaults to env var BEDROCK_MODEL_ID or amazon.nova-pro-v1:0)
             dynamodb_table: DynamoDB table name (defaults to env var DYNAMODB_TABLE_NAME or ChatbotConversations)
+            ddb_client: Shared aiobotocore DynamoDB client (see create_dynamodb_client)
+            writer: Optional DynamoDBWriter - messages are queued on it instead of written inline
+            cache: Optional SemanticCache consulted before calling Bedrock
+            max_turns: Exchanges sent to Bedrock verbatim (defaults to env var MAX_CONTEXT_TURNS or 10)
+            summary_model_id: Model that summarizes older exchanges (defaults to env var SUMMARY_MODEL_ID or us.amazon.nova-micro-v1:0)
         """
         self.aws_region = aws_region or os.getenv("AWS_REGION", "us-east-1")
         self.model_id = model_id or os.getenv("BEDROCK_MODEL_ID", "us.amazon.nova-pro-v1:0")
         self.dynamodb_table = dynamodb_table or os.getenv("DYNAMODB_TABLE_NAME", "ChatbotConversations")
+        self.max_turns = max_turns or int(os.getenv("MAX_CONTEXT_TURNS", "10"))
+        self.summary_model_id = summary_model_id or os.getenv("SUMMARY_MODEL_ID", "us.amazon.nova-micro-v1:0")
         self.session_id = str(uuid.uuid4())
         
-        # Initialize AWS clients
-        self.bedrock_client = boto3.client(
-            service_name='bedrock-runtime',
-            region_name=self.aws_region
-        )
-        
-        self.dynamodb = boto3.resource('dynamodb', region_name=self.aws_region)
+        # Bind the shared AWS clients
+        self.bedrock_client = get_bedrock_client(self.aws_region)
+        self.ddb_client = ddb_client
+        self.writer = writer
+        self.cache = cache
         
-        # Initialize LangChain ChatBedrock
-        self.chat = ChatBedrock(
-            client=self.bedrock_client,
-            model_id=self.model_id,
-            model_kwargs={
-                "temperature": 0.7,
-                "max_tokens": 2048,
-            }
-        )
-        
-        # Conversation history
-        self.messages = [
-            SystemMessage(content="You are a helpful AI assistant powered by AWS. Be concise and friendly.")
-        ]
+        # LangChain ChatBedrock (shared across sessions using the same model)
+        self.chat = get_chat_model(self.aws_region, self.model_id)
         
-        print(f"✓ Connected to AWS Bedrock ({self.aws_region})")
-        print(f"✓ Using model: {self.model_id}")
-        print(f"✓ Session ID: {self.session_id}")
+        # Conversation history - the system message carries the summary of trimmed exchanges
+        self.summary = ""
+        self.messages = [self._system_message()]
+        self._trimmed_counts = {HumanMessage: 0, AIMessage: 0}
     
-    def save_message_to_dynamodb(self, role, content):
+    async def save_message_to_dynamodb(self, role, content):
         """Save a message to DynamoDB"""
         try:
-            table = self.dynamodb.Table(self.dynamodb_table)
-            
             item = {
-                'SessionId': self.session_id,
-                'Timestamp': datetime.utcnow().isoformat(),
-                'MessageId': str(uuid.uuid4()),
-                'Role': role,
-                'Content': content
+                'SessionId': {'S': self.session_id},
+                'Timestamp': {'S': datetime.utcnow().isoformat()},
+                'MessageId': {'S': str(uuid.uuid4())},
+                'Role': {'S': role},
+                'Content': {'S': content}
             }
             
-            table.put_item(Item=item)
+            if self.writer is not None:
+                self.writer.put(item)
+            else:
+                await self.ddb_client.put_item(TableName=self.dynamodb_table, Item=item)
         except ClientError as e:
             print(f"Warning: Could not save to DynamoDB: {e.response['Error']['Message']}")
             print("Conversation will continue without persistence.")
         except Exception as e:
             print(f"Warning: DynamoDB error: {str(e)}")
     
-    def get_conversation_history(self, session_id=None):
-        """Retrieve conversation history from DynamoDB"""
+    async def get_conversation_history(self, session_id=None, limit=50):
+        """Retrieve the most recent messages of a conversation from DynamoDB"""
         try:
-            table = self.dynamodb.Table(self.dynamodb_table)
-            session_id = session_id or self.session_id
-            
-            response = table.query(
-                KeyConditionExpression='SessionId = :sid',
-                ExpressionAttributeValues={':sid': session_id}
+            items, _ = await fetch_history(
+                session_id or self.session_id,
+                self.dynamodb_table,
+                self.ddb_client,
+                limit=limit
             )
-            
-            return response.get('Items', [])
+            return items
         except Exception as e:
             print(f"Could not retrieve history: {str(e)}")
             return []
     
-    def chat_response(self, user_input):
+    async def chat_response(self, user_input):
         """
         Get a response from the chatbot
         
@@ -111,16 +336,20 @@ class AWSChatbot:
         """
         # Add user message
         self.messages.append(HumanMessage(content=user_input))
-        self.save_message_to_dynamodb("user", user_input)
+        await self.save_message_to_dynamodb("user", user_input)
         
         # Get AI response
         try:
-            response = self.chat.invoke(self.messages)
-            assistant_message = response.content
+            assistant_message, vector = await self._cache_lookup()
+            if assistant_message is None:
+                response = await self.chat.ainvoke(self.messages)
+                assistant_message = response.content
+                await self._cache_store(vector, assistant_message)
             
             # Add to conversation history
             self.messages.append(AIMessage(content=assistant_message))
-            self.save_message_to_dynamodb("assistant", assistant_message)
+            await self.save_message_to_dynamodb("assistant", assistant_message)
+            await self.trim_context()
             
             return assistant_message
         except Exception as e:
@@ -128,10 +357,144 @@ class AWSChatbot:
             print(error_msg)
             return error_msg
     
+    async def stream_response(self, user_input):
+        """
+        Stream a response from the chatbot
+        
+        Args:
+            user_input: User's message
+            
+        Yields:
+            str: Chunks of the chatbot's response as Bedrock generates them
+        """
+        # Add user message
+        self.messages.append(HumanMessage(content=user_input))
+        await self.save_message_to_dynamodb("user", user_input)
+        
+        # Stream AI response
+        chunks = []
+        try:
+            cached, vector = await self._cache_lookup()
+            if cached is not None:
+                chunks.append(cached)
+                yield cached
+            else:
+                async for chunk in self.chat.astream(self.messages):
+                    # Converse models (Nova) stream content blocks, so read the flattened text
+                    text = chunk.text
+                    if text:
+                        chunks.append(text)
+                        yield text
+        except Exception as e:
+            error_msg = f"Error getting response: {str(e)}"
+            print(error_msg)
+            yield error_msg
+            return
+        
+        # Add the complete message to conversation history
+        assistant_message = "".join(chunks)
+        if cached is None:
+            await self._cache_store(vector, assistant_message)
+        self.messages.append(AIMessage(content=assistant_message))
+        await self.save_message_to_dynamodb("assistant", assistant_message)
+        await self.trim_context()
+    
+    async def trim_context(self):
+        """
+        Keep the latest exchanges verbatim and fold older ones into the running summary
+        
+        Once the history exceeds max_turns exchanges, the older half is
+        summarized, so the summary model runs every few turns rather than on
+        every turn.
+        """
+        history = self.messages[1:]
+        if len(history) <= 2 * self.max_turns:
+            return
+        
+        # Keep roughly half the window, starting on a user message, and never drop the latest reply
+        drop = len(history) - self.max_turns
+        while drop < len(history) - 1 and not isinstance(history[drop], HumanMessage):
+            drop += 1
+        dropped = history[:drop]
+        
+        # Keep the messages if they couldn't be summarized - they are retried next turn
+        summary = await self._summarize(dropped)
+        if summary is None:
+            return
+        
+        for message in dropped:
+            self._trimmed_counts[type(message)] += 1
+        self.summary = summary
+        self.messages = [self._system_message()] + history[drop:]
+    
+    async def _summarize(self, messages):
+        """Return the running summary extended with the given messages, or None if summarizing fails"""
+        transcript = "\n".join(
+            f"{'User' if isinstance(m, HumanMessage) else 'Assistant'}: {m.content}"
+            for m in messages
+        )
+        try:
+            response = await get_chat_model(self.aws_region, self.summary_model_id).ainvoke([
+                SystemMessage(content=SUMMARY_PROMPT),
+                HumanMessage(content=(
+                    f"Current summary:\n{self.summary or '(none)'}\n\n"
+                    f"New lines of conversation:\n{transcript}"
+                ))
+            ])
+            return response.content
+        except Exception as e:
+            print(f"Warning: Could not summarize conversation: {str(e)}")
+            return None
+    
+    def _system_message(self):
+        """System prompt, followed by the summary of trimmed exchanges if there is one"""
+        if not self.summary:
+            return SystemMessage(content=SYSTEM_PROMPT)
+        return SystemMessage(
+            content=f"{SYSTEM_PROMPT}\n\nSummary of the earlier conversation:\n{self.summary}"
+        )
+    
+    async def _cache_lookup(self):
+        """Look up the pending user message in the semantic cache, if one is configured"""
+        if self.cache is None:
+            return None, None
+        try:
+            return await self.cache.lookup(self.model_id, self.messages)
+        except Exception as e:
+            print(f"Warning: Semantic cache lookup failed: {str(e)}")
+            return None, None
+    
+    async def _cache_store(self, vector, content):
+        """Cache a fresh response under the prompt vector from _cache_lookup"""
+        if self.cache is None or vector is None:
+            return
+        try:
+            await self.cache.store(self.model_id, vector, content)
+        except Exception as e:
+            print(f"Warning: Semantic cache write failed: {str(e)}")
+    
+    def export_messages(self):
+        """Serialize the conversation (without the system prompt) as role/content pairs"""
+        return [
+            {"role": "user" if isinstance(m, HumanMessage) else "assistant", "content": m.content}
+            for m in self.messages[1:]
+        ]
+    
+    def load_messages(self, items, summary=""):
+        """Restore a conversation previously serialized with export_messages"""
+        self.summary = summary
+        self.messages = [self._system_message()] + [
+            MESSAGE_TYPES[item["role"]](content=item["content"]) for item in items
+        ]
+    
     def get_session_summary(self):
         """Get summary of current session"""
-        user_messages = sum(1 for m in self.messages if isinstance(m, HumanMessage))
-        ai_messages = sum(1 for m in self.messages if isinstance(m, AIMessage))
+        user_messages = self._trimmed_counts[HumanMessage] + sum(
+            1 for m in self.messages if isinstance(m, HumanMessage)
+        )
+        ai_messages = self._trimmed_counts[AIMessage] + sum(
+            1 for m in self.messages if isinstance(m, AIMessage)
+        )
         
         return {
             "session_id": self.session_id,
@@ -144,6 +507,11 @@ class AWSChatbot:
 
 def interactive_chat():
     """Run an interactive chat session"""
+    asyncio.run(_interactive_chat())
+
+
+async def _interactive_chat():
+    """Async body of interactive_chat - owns the DynamoDB client for the session"""
     print("=" * 60)
     print("AWS Bedrock Chatbot with DynamoDB Storage")
     print("=" * 60)
@@ -152,19 +520,30 @@ def interactive_chat():
     print("Type 'summary' to see session summary.")
     print("-" * 60)
     
-    # Initialize chatbot
-    try:
-        chatbot = AWSChatbot()
-    except Exception as e:
-        print(f"\n❌ Error initializing chatbot: {e}")
-        print("\nPlease check:")
-        print("1. AWS credentials are configured (aws configure)")
-        print("2. You have access to AWS Bedrock")
-        print("3. DynamoDB table exists (run setup_dynamodb.py)")
-        return
-    
-    print("\n✓ Chatbot ready! Start chatting...\n")
-    
+    async with AsyncExitStack() as stack:
+        # Initialize chatbot
+        try:
+            chatbot = AWSChatbot()
+            chatbot.ddb_client = await stack.enter_async_context(
+                create_dynamodb_client(chatbot.aws_region)
+            )
+        except Exception as e:
+            print(f"\n❌ Error initializing chatbot: {e}")
+            print("\nPlease check:")
+            print("1. AWS credentials are configured (aws configure)")
+            print("2. You have access to AWS Bedrock")
+            print("3. DynamoDB table exists (run setup_dynamodb.py)")
+            return
+        
+        print(f"✓ Connected to AWS Bedrock ({chatbot.aws_region})")
+        print(f"✓ Using model: {chatbot.model_id}")
+        print(f"✓ Session ID: {chatbot.session_id}")
+        print("\n✓ Chatbot ready! Start chatting...\n")
+        await _chat_loop(chatbot)
+
+
+async def _chat_loop(chatbot):
+    """Read user input and print responses until the user quits"""
     while True:
         # Get user input
         user_input = input("\nYou: ").strip()
@@ -178,7 +557,7 @@ def interactive_chat():
             break
         
         if user_input.lower() == 'history':
-            history = chatbot.get_conversation_history()
+            history = await chatbot.get_conversation_history()
             print(f"\n📜 Conversation History ({len(history)} messages):")
             for item in history:
                 print(f"  [{item['Timestamp']}] {item['Role']}: {item['Content'][:50]}...")
@@ -196,7 +575,7 @@ def interactive_chat():
             continue
         
         # Get response
-        response = chatbot.chat_response(user_input)
+        response = await chatbot.chat_response(user_input)
         print(f"\n🤖 Assistant: {response}")
 
 
@@ -212,12 +591,19 @@ def simple_query(question, model_id=None):
         str: The response
     """
     try:
-        chatbot = AWSChatbot(model_id=model_id) if model_id else AWSChatbot()
-        return chatbot.chat_response(question)
+        return asyncio.run(_simple_query(question, model_id))
     except Exception as e:
         return f"Error: {str(e)}"
 
 
+async def _simple_query(question, model_id=None):
+    """Async body of simple_query"""
+    chatbot = AWSChatbot(model_id=model_id) if model_id else AWSChatbot()
+    async with create_dynamodb_client(chatbot.aws_region) as ddb_client:
+        chatbot.ddb_client = ddb_client
+        return await chatbot.chat_response(question)
+
+
 if __name__ == "__main__":
     # Run interactive chat
     interactive_chat()
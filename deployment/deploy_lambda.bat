@@ -10,6 +10,19 @@ set AWS_REGION=us-east-1
 set ECR_REPO_NAME=chatbot-lambda
 set LAMBDA_FUNCTION_NAME=chatbot-api
 set IMAGE_TAG=latest
+if not defined LAMBDA_ARCH set LAMBDA_ARCH=arm64
+if not defined LAMBDA_MEMORY_SIZE set LAMBDA_MEMORY_SIZE=1024
+if "%LAMBDA_ARCH%"=="arm64" (set DOCKER_PLATFORM=linux/arm64) else (set DOCKER_PLATFORM=linux/amd64)
+
+REM Redis (e.g. ElastiCache) holds the active sessions and must be reachable from the function.
+REM ElastiCache is only reachable inside its VPC, so set LAMBDA_SUBNET_IDS and LAMBDA_SECURITY_GROUP_IDS
+REM (comma-separated) to attach the function to it.
+if not defined REDIS_URL (
+    echo ERROR: REDIS_URL is not set. The API needs Redis for sessions - see deployment\DEPLOY_LAMBDA.md
+    exit /b 1
+)
+set VPC_CONFIG_ARGS=
+if defined LAMBDA_SUBNET_IDS if defined LAMBDA_SECURITY_GROUP_IDS set VPC_CONFIG_ARGS=--vpc-config SubnetIds=%LAMBDA_SUBNET_IDS%,SecurityGroupIds=%LAMBDA_SECURITY_GROUP_IDS%
 
 REM Get AWS Account ID
 for /f "tokens=*" %%i in ('aws sts get-caller-identity --query Account --output text') do set AWS_ACCOUNT_ID=%%i
@@ -18,6 +31,8 @@ set ECR_REPO_URI=%AWS_ACCOUNT_ID%.dkr.ecr.%AWS_REGION%.amazonaws.com/%ECR_REPO_N
 echo Region: %AWS_REGION%
 echo Account ID: %AWS_ACCOUNT_ID%
 echo ECR Repository: %ECR_REPO_URI%
+echo Architecture: %LAMBDA_ARCH% (%LAMBDA_MEMORY_SIZE% MB)
+echo Redis: %REDIS_URL%
 echo.
 
 REM Step 1: Create ECR repository
@@ -35,7 +50,7 @@ echo %ECR_PASSWORD% | docker login --username AWS --password-stdin %ECR_REPO_URI
 REM Step 3: Build Docker image
 echo Step 3: Building Docker image...
 cd ..
-docker build -f deployment\Dockerfile.lambda -t %ECR_REPO_NAME%:%IMAGE_TAG% .
+docker build --platform %DOCKER_PLATFORM% --provenance=false -f deployment\Dockerfile.lambda -t %ECR_REPO_NAME%:%IMAGE_TAG% .
 
 REM Step 4: Tag image
 echo Step 4: Tagging image...
@@ -47,7 +62,9 @@ docker push %ECR_REPO_URI%:%IMAGE_TAG%
 
 REM Step 6: Update Lambda function
 echo Step 6: Updating Lambda function...
-aws lambda update-function-code --function-name %LAMBDA_FUNCTION_NAME% --image-uri %ECR_REPO_URI%:%IMAGE_TAG% --region %AWS_REGION%
+aws lambda update-function-code --function-name %LAMBDA_FUNCTION_NAME% --image-uri %ECR_REPO_URI%:%IMAGE_TAG% --architectures %LAMBDA_ARCH% --region %AWS_REGION%
+aws lambda wait function-updated --function-name %LAMBDA_FUNCTION_NAME% --region %AWS_REGION%
+aws lambda update-function-configuration --function-name %LAMBDA_FUNCTION_NAME% --memory-size %LAMBDA_MEMORY_SIZE% --environment "Variables={AWS_REGION=%AWS_REGION%,BEDROCK_MODEL_ID=us.amazon.nova-pro-v1:0,DYNAMODB_TABLE_NAME=ChatbotConversations,REDIS_URL=%REDIS_URL%}" %VPC_CONFIG_ARGS% --region %AWS_REGION%
 
 REM Get Function URL
 for /f "tokens=*" %%i in ('aws lambda get-function-url-config --function-name %LAMBDA_FUNCTION_NAME% --region %AWS_REGION% --query FunctionUrl --output text') do set FUNCTION_URL=%%i
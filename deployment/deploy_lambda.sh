@@ -13,12 +13,44 @@ AWS_ACCOUNT_ID=$(aws sts get-caller-identity --query Account --output text)
 ECR_REPO_NAME="chatbot-lambda"
 LAMBDA_FUNCTION_NAME="chatbot-api"
 IMAGE_TAG="latest"
+LAMBDA_ARCH=${LAMBDA_ARCH:-"arm64"}            # arm64 (Graviton) or x86_64
+LAMBDA_MEMORY_SIZE=${LAMBDA_MEMORY_SIZE:-"1024"}  # MB - tune with AWS Lambda Power Tuning
+
+# Redis (e.g. ElastiCache) holds the active sessions and must be reachable from the function.
+# ElastiCache is only reachable inside its VPC, so pass the subnets and security group to attach to.
+REDIS_URL=${REDIS_URL:-""}                        # e.g. redis://my-cache.xxxxxx.use1.cache.amazonaws.com:6379/0
+LAMBDA_SUBNET_IDS=${LAMBDA_SUBNET_IDS:-""}        # comma-separated private subnet IDs
+LAMBDA_SECURITY_GROUP_IDS=${LAMBDA_SECURITY_GROUP_IDS:-""}  # comma-separated security group IDs
+
+if [ -z "${REDIS_URL}" ]; then
+    echo "❌ REDIS_URL is not set. The API needs Redis for sessions - see deployment/DEPLOY_LAMBDA.md"
+    exit 1
+fi
+
+LAMBDA_ENVIRONMENT="Variables={AWS_REGION=${AWS_REGION},BEDROCK_MODEL_ID=us.amazon.nova-pro-v1:0,DYNAMODB_TABLE_NAME=ChatbotConversations,REDIS_URL=${REDIS_URL}}"
+VPC_CONFIG_ARGS=""
+if [ -n "${LAMBDA_SUBNET_IDS}" ] && [ -n "${LAMBDA_SECURITY_GROUP_IDS}" ]; then
+    VPC_CONFIG_ARGS="--vpc-config SubnetIds=${LAMBDA_SUBNET_IDS},SecurityGroupIds=${LAMBDA_SECURITY_GROUP_IDS}"
+fi
+
+if [ "${LAMBDA_ARCH}" = "arm64" ]; then
+    DOCKER_PLATFORM="linux/arm64"
+else
+    DOCKER_PLATFORM="linux/amd64"
+fi
 
 ECR_REPO_URI="${AWS_ACCOUNT_ID}.dkr.ecr.${AWS_REGION}.amazonaws.com/${ECR_REPO_NAME}"
 
 echo "Region: ${AWS_REGION}"
 echo "Account ID: ${AWS_ACCOUNT_ID}"
 echo "ECR Repository: ${ECR_REPO_URI}"
+echo "Architecture: ${LAMBDA_ARCH} (${LAMBDA_MEMORY_SIZE} MB)"
+echo "Redis: ${REDIS_URL}"
+if [ -n "${VPC_CONFIG_ARGS}" ]; then
+    echo "VPC subnets: ${LAMBDA_SUBNET_IDS}"
+else
+    echo "VPC: none (Redis must be reachable over the internet)"
+fi
 echo ""
 
 # Step 1: Create ECR repository if it doesn't exist
@@ -33,7 +65,9 @@ aws ecr get-login-password --region ${AWS_REGION} | \
 
 # Step 3: Build Docker image
 echo "Step 3: Building Docker image..."
-docker build -f deployment/Dockerfile.lambda -t ${ECR_REPO_NAME}:${IMAGE_TAG} .
+# Build for the function's architecture; Lambda rejects multi-manifest (provenance) images
+docker build --platform ${DOCKER_PLATFORM} --provenance=false \
+    -f deployment/Dockerfile.lambda -t ${ECR_REPO_NAME}:${IMAGE_TAG} .
 
 # Step 4: Tag image for ECR
 echo "Step 4: Tagging image..."
@@ -52,6 +86,15 @@ if aws lambda get-function --function-name ${LAMBDA_FUNCTION_NAME} --region ${AW
     aws lambda update-function-code \
         --function-name ${LAMBDA_FUNCTION_NAME} \
         --image-uri ${ECR_REPO_URI}:${IMAGE_TAG} \
+        --architectures ${LAMBDA_ARCH} \
+        --region ${AWS_REGION}
+    
+    aws lambda wait function-updated --function-name ${LAMBDA_FUNCTION_NAME} --region ${AWS_REGION}
+    aws lambda update-function-configuration \
+        --function-name ${LAMBDA_FUNCTION_NAME} \
+        --memory-size ${LAMBDA_MEMORY_SIZE} \
+        --environment "${LAMBDA_ENVIRONMENT}" \
+        ${VPC_CONFIG_ARGS} \
         --region ${AWS_REGION}
 else
     echo "Creating new Lambda function..."
@@ -72,8 +115,10 @@ else
         --code ImageUri=${ECR_REPO_URI}:${IMAGE_TAG} \
         --role ${ROLE_ARN} \
         --timeout 300 \
-        --memory-size 1024 \
-        --environment "Variables={AWS_REGION=${AWS_REGION},BEDROCK_MODEL_ID=us.amazon.nova-pro-v1:0,DYNAMODB_TABLE_NAME=ChatbotConversations}" \
+        --architectures ${LAMBDA_ARCH} \
+        --memory-size ${LAMBDA_MEMORY_SIZE} \
+        --environment "${LAMBDA_ENVIRONMENT}" \
+        ${VPC_CONFIG_ARGS} \
         --region ${AWS_REGION}
 fi
 
@@ -3,38 +3,110 @@ AWS Lambda handler for FastAPI application
 Supports both API Gateway REST API and HTTP API formats
 """
 
-import json
+import os
+import base64
+import asyncio
+import logging
+import orjson
 from mangum import Mangum
-from api import app
+
+# Records go to the Lambda runtime's handler on the root logger (CloudWatch)
+logger = logging.getLogger(__name__)
+logger.setLevel(os.getenv("LOG_LEVEL", "INFO"))
+
+# Lambda freezes the process between invocations, so don't hold messages
+# back waiting for a fuller DynamoDB batch
+os.environ.setdefault("DYNAMODB_FLUSH_INTERVAL", "0")
+
+from api import app, get_ddb_client
+from chatbot_aws import get_chat_model
 
 # Create Mangum adapter for Lambda
 # This allows FastAPI to work seamlessly with AWS Lambda
-handler = Mangum(app, lifespan="off")
+asgi_handler = Mangum(app, lifespan="off")
+
+# Build the shared clients during the init phase, so the first request
+# only pays network latency. Mangum runs requests on this same event loop.
+get_chat_model(
+    os.getenv("AWS_REGION", "us-east-1"),
+    os.getenv("BEDROCK_MODEL_ID", "us.amazon.nova-pro-v1:0")
+)
+asyncio.get_event_loop().run_until_complete(get_ddb_client())
+
+CHAT_PATHS = ("/chat", "/chat/stream")
+INVALID_CHAT_BODY = orjson.dumps({"detail": "A non-empty 'message' is required"}).decode()
+
+
+def reject_invalid_chat(event):
+    """
+    Reject chat requests without a message before they go through the ASGI app
+    
+    Args:
+        event: API Gateway (REST or HTTP API) or Function URL event
+    
+    Returns:
+        dict: A 422 response, or None if the request should be handled normally
+    """
+    http = event.get("requestContext", {}).get("http", {})
+    method = event.get("httpMethod") or http.get("method")
+    path = event.get("rawPath") or event.get("path") or ""
+    if method != "POST" or not path.endswith(CHAT_PATHS):
+        return None
+    
+    try:
+        body = event.get("body") or b""
+        if event.get("isBase64Encoded"):
+            body = base64.b64decode(body)
+        message = orjson.loads(body).get("message")
+    except (ValueError, AttributeError):
+        message = None
+    
+    if isinstance(message, str) and message:
+        return None
+    return {
+        "statusCode": 422,
+        "headers": {"content-type": "application/json"},
+        "body": INVALID_CHAT_BODY,
+        "isBase64Encoded": False
+    }
+
+
+def handler(event, context):
+    """Lambda entry point - drains queued DynamoDB writes before returning"""
+    rejected = reject_invalid_chat(event)
+    if rejected is not None:
+        return rejected
+    
+    response = asgi_handler(event, context)
+    if app.state.ddb_writer is not None:
+        asyncio.get_event_loop().run_until_complete(app.state.ddb_writer.flush())
+    return response
+
 
 def lambda_handler_with_logging(event, context):
     """
     Lambda handler with enhanced logging
-    Useful for debugging
+    Useful for debugging - set LOG_LEVEL=DEBUG to log full events and responses
     """
-    print("=" * 60)
-    print("Lambda Invocation")
-    print("=" * 60)
-    print(f"Event: {json.dumps(event, indent=2)}")
-    print(f"Context: {context}")
-    print("=" * 60)
+    # Events and responses are only serialized when debug logging is on
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        # One record (one CloudWatch log event) for the whole invocation header
+        logger.debug("Lambda invocation\nEvent: %s\nContext: %s", orjson.dumps(event).decode(), context)
     
     try:
         response = handler(event, context)
-        print(f"Response: {json.dumps(response, indent=2)}")
+        if debug:
+            logger.debug("Response: %s", orjson.dumps(response).decode())
         return response
     except Exception as e:
-        print(f"Error: {str(e)}")
+        logger.exception("Error: %s", e)
         return {
             "statusCode": 500,
-            "body": json.dumps({
+            "body": orjson.dumps({
                 "error": str(e),
                 "message": "Internal server error"
-            })
+            }).decode()
         }
 
 # Uncomment for enhanced logging
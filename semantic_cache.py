@@ -0,0 +1,142 @@
+"""
+Semantic response cache for the AWS Chatbot
+Answers repeated or near-duplicate questions from Redis instead of calling Bedrock,
+using Bedrock embeddings and a Redis vector (HNSW) index. Requires Redis Stack.
+"""
+
+import os
+import re
+import uuid
+import hashlib
+from array import array
+from langchain_aws import BedrockEmbeddings
+from langchain_core.messages import HumanMessage, AIMessage
+from redis.exceptions import ResponseError
+from redis.commands.search.field import TagField, VectorField
+from redis.commands.search.query import Query
+
+try:
+    from redis.commands.search.index_definition import IndexDefinition, IndexType
+except ImportError:  # redis-py < 6
+    from redis.commands.search.indexDefinition import IndexDefinition, IndexType
+
+from chatbot_aws import get_bedrock_client
+
+
+class SemanticCache:
+    """Redis vector-search cache of assistant responses keyed by prompt embeddings"""
+
+    INDEX_NAME = "idx:llmcache"
+    KEY_PREFIX = "cache:"
+
+    def __init__(self,
+                 redis_client,
+                 aws_region=None,
+                 embedding_model_id=None,
+                 dimensions=None,
+                 threshold=None,
+                 ttl=None,
+                 context_messages=None):
+        """
+        Initialize the semantic cache
+
+        Args:
+            redis_client: Shared redis.asyncio client (must have the search module)
+            aws_region: AWS region (defaults to env var AWS_REGION or us-east-1)
+            embedding_model_id: Bedrock embedding model (defaults to env var SEMANTIC_CACHE_EMBEDDING_MODEL or amazon.titan-embed-text-v2:0)
+            dimensions: Embedding size (defaults to env var SEMANTIC_CACHE_DIMENSIONS or 1024)
+            threshold: Minimum cosine similarity for a hit (defaults to env var SEMANTIC_CACHE_THRESHOLD or 0.95)
+            ttl: Seconds a cached response is kept (defaults to env var SEMANTIC_CACHE_TTL or 86400)
+            context_messages: Previous messages included in the cache key (defaults to env var SEMANTIC_CACHE_CONTEXT_MESSAGES or 2)
+        """
+        self.redis = redis_client
+        self.aws_region = aws_region or os.getenv("AWS_REGION", "us-east-1")
+        self.dimensions = dimensions or int(os.getenv("SEMANTIC_CACHE_DIMENSIONS", "1024"))
+        self.threshold = threshold or float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+        self.ttl = ttl or int(os.getenv("SEMANTIC_CACHE_TTL", "86400"))
+        if context_messages is None:
+            context_messages = int(os.getenv("SEMANTIC_CACHE_CONTEXT_MESSAGES", "2"))
+        self.context_messages = context_messages
+        self.embeddings = BedrockEmbeddings(
+            client=get_bedrock_client(self.aws_region),
+            model_id=embedding_model_id or os.getenv(
+                "SEMANTIC_CACHE_EMBEDDING_MODEL", "amazon.titan-embed-text-v2:0"
+            )
+        )
+        self._index_ready = False
+
+    async def lookup(self, model_id, messages):
+        """
+        Find a cached response for the latest user message
+
+        Args:
+            model_id: Bedrock model the response must come from
+            messages: Conversation so far, ending with the user's message
+
+        Returns:
+            tuple: (cached response or None, prompt vector to pass to store)
+        """
+        await self._ensure_index()
+        vector = await self._embed(messages)
+
+        query = (
+            Query(f"(@model:{{{self._model_tag(model_id)}}})=>[KNN 1 @vec $vec AS distance]")
+            .return_fields("content", "distance")
+            .dialect(2)
+        )
+        result = await self.redis.ft(self.INDEX_NAME).search(query, query_params={"vec": vector})
+
+        if result.docs:
+            doc = result.docs[0]
+            # COSINE distance is 1 - cosine similarity
+            if 1 - float(doc.distance) >= self.threshold:
+                return doc.content, vector
+        return None, vector
+
+    async def store(self, model_id, vector, content):
+        """Cache a response under the prompt vector returned by lookup"""
+        key = f"{self.KEY_PREFIX}{uuid.uuid4().hex}"
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hset(key, mapping={
+                "model": self._model_tag(model_id),
+                "content": content,
+                "vec": vector
+            })
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def _embed(self, messages):
+        """Embed the normalized user message plus the preceding context as FLOAT32 bytes"""
+        context = [
+            m for m in messages[:-1] if isinstance(m, (HumanMessage, AIMessage))
+        ][-self.context_messages:] if self.context_messages else []
+        text = "\n".join(
+            re.sub(r"\s+", " ", m.content).strip().lower() for m in context + messages[-1:]
+        )
+        return array("f", await self.embeddings.aembed_query(text)).tobytes()
+
+    async def _ensure_index(self):
+        """Create the vector index on first use"""
+        if self._index_ready:
+            return
+        try:
+            await self.redis.ft(self.INDEX_NAME).create_index(
+                [
+                    TagField("model"),
+                    VectorField("vec", "HNSW", {
+                        "TYPE": "FLOAT32",
+                        "DIM": self.dimensions,
+                        "DISTANCE_METRIC": "COSINE"
+                    })
+                ],
+                definition=IndexDefinition(prefix=[self.KEY_PREFIX], index_type=IndexType.HASH)
+            )
+        except ResponseError as e:
+            if "already exists" not in str(e):
+                raise
+        self._index_ready = True
+
+    @staticmethod
+    def _model_tag(model_id):
+        """Model IDs contain tag-syntax punctuation, so they are indexed by digest"""
+        return hashlib.sha1(model_id.encode()).hexdigest()
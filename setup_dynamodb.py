@@ -3,13 +3,42 @@ DynamoDB Table Setup Script
 Creates the necessary DynamoDB table for storing conversation history
 """
 
-import boto3
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from botocore.exceptions import ClientError
+from botocore.exceptions import ClientError, WaiterError
 
 load_dotenv()
 
+# Clients are reused across calls (and warm Lambda invocations), keyed by (service, region).
+# Creation is locked because boto3's default session isn't safe to build from several threads.
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def _client(service, region=None):
+    """Return the shared boto3 client for a service and region, creating it on first use"""
+    key = (service, region)
+    client = _CLIENTS.get(key)
+    if client is None:
+        with _CLIENTS_LOCK:
+            client = _CLIENTS.get(key)
+            if client is None:
+                # boto3 and botocore.config are imported on first use, so loading this module stays cheap
+                import boto3
+                from botocore.config import Config
+                
+                # Keep connections alive between calls instead of redoing the TLS handshake
+                client = boto3.client(service, region_name=region, config=Config(
+                    tcp_keepalive=True,
+                    max_pool_connections=50,
+                    retries={'mode': 'standard', 'max_attempts': 3}
+                ))
+                _CLIENTS[key] = client
+    return client
+
+
 def create_dynamodb_table(table_name="ChatbotConversations", region=None):
     """
     Create DynamoDB table for conversation storage
@@ -20,25 +49,10 @@ def create_dynamodb_table(table_name="ChatbotConversations", region=None):
     """
     region = region or os.getenv("AWS_REGION", "us-east-1")
     
-    dynamodb = boto3.client('dynamodb', region_name=region)
+    dynamodb = _client('dynamodb', region)
     
     try:
-        # Check if table already exists
-        existing_tables = dynamodb.list_tables()['TableNames']
-        
-        if table_name in existing_tables:
-            print(f"✓ Table '{table_name}' already exists")
-            
-            # Get table info
-            response = dynamodb.describe_table(TableName=table_name)
-            status = response['Table']['TableStatus']
-            print(f"  Status: {status}")
-            print(f"  Region: {region}")
-            return True
-        
-        # Create table
-        print(f"Creating DynamoDB table '{table_name}'...")
-        
+        # Create table - an existing table is reported by ResourceInUseException below
         response = dynamodb.create_table(
             TableName=table_name,
             KeySchema=[
@@ -75,10 +89,19 @@ def create_dynamodb_table(table_name="ChatbotConversations", region=None):
         )
         
         print(f"✓ Table '{table_name}' created successfully!")
-        print(f"  Status: {response['TableDescription']['TableStatus']}")
         print(f"  ARN: {response['TableDescription']['TableArn']}")
         print(f"  Region: {region}")
-        print("\nNote: Table is being created. It may take a few moments to become ACTIVE.")
+        
+        # Wait (up to ~40s) for the table to become ACTIVE so it can be written to right away
+        try:
+            dynamodb.get_waiter('table_exists').wait(
+                TableName=table_name,
+                WaiterConfig={'Delay': 2, 'MaxAttempts': 20}
+            )
+            print("  Status: ACTIVE")
+        except WaiterError:
+            print(f"  Status: {response['TableDescription']['TableStatus']}")
+            print("\nNote: Table is still being created. It may take a few more moments to become ACTIVE.")
         
         return True
         
@@ -88,6 +111,12 @@ def create_dynamodb_table(table_name="ChatbotConversations", region=None):
         
         if error_code == 'ResourceInUseException':
             print(f"✓ Table '{table_name}' already exists")
+            try:
+                status = dynamodb.describe_table(TableName=table_name)['Table']['TableStatus']
+                print(f"  Status: {status}")
+            except ClientError:
+                pass
+            print(f"  Region: {region}")
             return True
         else:
             print(f"❌ Error creating table: {error_msg}")
@@ -106,7 +135,7 @@ def delete_dynamodb_table(table_name="ChatbotConversations", region=None):
         region: AWS region
     """
     region = region or os.getenv("AWS_REGION", "us-east-1")
-    dynamodb = boto3.client('dynamodb', region_name=region)
+    dynamodb = _client('dynamodb', region)
     
     try:
         print(f"Deleting table '{table_name}'...")
@@ -118,11 +147,23 @@ def delete_dynamodb_table(table_name="ChatbotConversations", region=None):
         return False
 
 
-def check_aws_credentials():
-    """Check if AWS credentials are configured"""
+def check_aws_credentials(identity=None):
+    """
+    Check if AWS credentials are configured
+    
+    Args:
+        identity: Future of a get_caller_identity call already in flight (optional)
+    """
+    # Inside Lambda the execution role provides the credentials - skip the STS round trip
+    if os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+        print("✓ AWS Credentials configured (Lambda execution role)")
+        return True
+    
     try:
-        sts = boto3.client('sts')
-        identity = sts.get_caller_identity()
+        if identity is not None:
+            identity = identity.result()
+        else:
+            identity = _client('sts').get_caller_identity()
         
         print("✓ AWS Credentials configured")
         print(f"  Account: {identity['Account']}")
@@ -137,24 +178,32 @@ def check_aws_credentials():
         return False
 
 
-def check_bedrock_access(region=None):
-    """Check if we have access to AWS Bedrock"""
+def check_bedrock_access(region=None, models=None):
+    """
+    Check if we have access to AWS Bedrock
+    
+    Args:
+        region: AWS region (defaults to env var or us-east-1)
+        models: Future of a list_foundation_models call already in flight (optional)
+    """
     region = region or os.getenv("AWS_REGION", "us-east-1")
     
     try:
-        bedrock = boto3.client('bedrock', region_name=region)
-        
-        # Try to list foundation models
-        response = bedrock.list_foundation_models()
+        # Try to list foundation models - ListFoundationModels isn't paginated (no
+        # nextToken, no boto3 paginator), so one response is the complete list
+        if models is not None:
+            response = models.result()
+        else:
+            response = _client('bedrock', region).list_foundation_models()
         models = response.get('modelSummaries', [])
         
         print(f"✓ AWS Bedrock access confirmed ({region})")
         print(f"  Available models: {len(models)}")
         
         # Show some popular models
-        claude_models = [m for m in models if 'claude' in m.get('modelId', '').lower()]
-        if claude_models:
-            print(f"  Claude models available: {len(claude_models)}")
+        claude_count = sum(1 for m in models if 'claude' in m.get('modelId', '').lower())
+        if claude_count:
+            print(f"  Claude models available: {claude_count}")
         
         return True
     except ClientError as e:
@@ -180,31 +229,41 @@ def main():
     print("=" * 60)
     print()
     
-    # Check AWS credentials
-    print("Step 1: Checking AWS Credentials...")
-    if not check_aws_credentials():
-        return
-    print()
-    
-    # Check Bedrock access
     region = os.getenv("AWS_REGION", "us-east-1")
-    print(f"Step 2: Checking AWS Bedrock Access ({region})...")
-    bedrock_ok = check_bedrock_access(region)
-    print()
+    table_name = os.getenv("DYNAMODB_TABLE_NAME", "ChatbotConversations")
     
-    if not bedrock_ok:
-        print("⚠️  Warning: Bedrock access check failed")
-        print("   The chatbot may not work without Bedrock access")
-        response = input("   Continue with DynamoDB setup anyway? (y/n): ")
-        if response.lower() != 'y':
+    # The two lookups are independent, so run them at once and report the
+    # results step by step. Clients are created in the workers, so errors such
+    # as a missing profile surface through the checks' own error reporting.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        identity = None
+        if not os.getenv("AWS_LAMBDA_FUNCTION_NAME"):  # The execution role needs no STS check
+            identity = executor.submit(lambda: _client('sts').get_caller_identity())
+        models = executor.submit(lambda: _client('bedrock', region).list_foundation_models())
+        
+        # Check AWS credentials
+        print("Step 1: Checking AWS Credentials...")
+        if not check_aws_credentials(identity):
             return
         print()
-    
-    # Create DynamoDB table
-    print("Step 3: Setting up DynamoDB Table...")
-    table_name = os.getenv("DYNAMODB_TABLE_NAME", "ChatbotConversations")
-    create_dynamodb_table(table_name, region)
-    print()
+        
+        # Check Bedrock access
+        print(f"Step 2: Checking AWS Bedrock Access ({region})...")
+        bedrock_ok = check_bedrock_access(region, models)
+        print()
+        
+        if not bedrock_ok:
+            print("⚠️  Warning: Bedrock access check failed")
+            print("   The chatbot may not work without Bedrock access")
+            response = input("   Continue with DynamoDB setup anyway? (y/n): ")
+            if response.lower() != 'y':
+                return
+            print()
+        
+        # Create DynamoDB table
+        print("Step 3: Setting up DynamoDB Table...")
+        create_dynamodb_table(table_name, region)
+        print()
     
     print("=" * 60)
     print("✓ Setup Complete!")
@@ -3,24 +3,60 @@ Test client for the Chatbot REST API
 Demonstrates how to use the API endpoints
 """
 
-import requests
-import json
+import httpx
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
 from typing import Optional
 
 class ChatbotAPIClient:
     """Client for interacting with the Chatbot API"""
     
+    MODELS_CACHE_TTL = 600  # Seconds - the model catalog rarely changes
+    
     def __init__(self, base_url: str = "http://localhost:8000"):
         self.base_url = base_url
-        self.session_id: Optional[str] = None
+        self._session_id: Optional[str] = None
+        self._history_path: Optional[str] = None
+        self._session_path: Optional[str] = None
+        
+        # One pooled client for all calls - over HTTPS, requests share a single
+        # multiplexed HTTP/2 connection instead of queueing on HTTP/1.1 sockets
+        self.http = httpx.Client(
+            base_url=base_url,
+            transport=httpx.HTTPTransport(
+                http2=True,
+                retries=2,
+                limits=httpx.Limits(max_connections=16, max_keepalive_connections=16)
+            ),
+            headers={"Content-Type": "application/json", "Accept-Encoding": "gzip, deflate"},
+            timeout=httpx.Timeout(60.0, connect=5.0)  # Replies can take a while to generate
+        )
+        
+        self._models_cache = None
+        self._models_cached_at = 0.0
+    
+    @property
+    def session_id(self) -> Optional[str]:
+        """Current session ID, sent with each message"""
+        return self._session_id
+    
+    @session_id.setter
+    def session_id(self, value: Optional[str]):
+        # Session-scoped paths are built once per session instead of on every call
+        if value != self._session_id:
+            self._session_id = value
+            self._history_path = f"/history/{value}" if value else None
+            self._session_path = f"/session/{value}" if value else None
     
     def health_check(self):
         """Check if the API is healthy"""
-        response = requests.get(f"{self.base_url}/health")
-        return response.json()
+        response = self.http.get("/health")
+        return orjson.loads(response.content)
     
-    def send_message(self, message: str, session_id: Optional[str] = None, model_id: Optional[str] = None):
-        """Send a message to the chatbot"""
+    def send_message(self, message: str, session_id: Optional[str] = None, model_id: Optional[str] = None,
+                     stream: bool = False):
+        """Send a message to the chatbot (with stream=True, returns an iterator of response chunks)"""
         payload = {"message": message}
         
         if session_id or self.session_id:
@@ -29,56 +65,100 @@ class ChatbotAPIClient:
         if model_id:
             payload["model_id"] = model_id
         
-        response = requests.post(
-            f"{self.base_url}/chat",
-            json=payload,
-            headers={"Content-Type": "application/json"}
-        )
+        if stream:
+            return self._stream_message(payload)
+        
+        response = self.http.post("/chat", content=orjson.dumps(payload))
         
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             # Store session ID for future requests
             self.session_id = data.get("session_id")
             return data
         else:
             return {"error": response.text, "status_code": response.status_code}
     
-    def get_history(self, session_id: Optional[str] = None):
-        """Get conversation history"""
-        sid = session_id or self.session_id
-        if not sid:
+    def _stream_message(self, payload: dict):
+        """Yield response chunks from the /chat/stream Server-Sent Events as they arrive"""
+        with self.http.stream("POST", "/chat/stream", content=orjson.dumps(payload)) as response:
+            response.raise_for_status()
+            # Store session ID for future requests
+            self.session_id = response.headers.get("X-Session-ID", self.session_id)
+            
+            event = None
+            for line in response.iter_lines():
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: "):
+                    data = orjson.loads(line[len("data: "):])
+                    if event == "error":
+                        raise RuntimeError(data["detail"])
+                    if event is None:
+                        yield self._chunk_text(data["content"])
+                elif not line:
+                    event = None
+    
+    @staticmethod
+    def _chunk_text(content) -> str:
+        """Return the text of a streamed chunk, flattening content blocks from older servers"""
+        if isinstance(content, str):
+            return content
+        if isinstance(content, list):
+            return "".join(
+                block if isinstance(block, str) else block.get("text", "")
+                for block in content
+                if isinstance(block, (str, dict))
+            )
+        raise RuntimeError(f"Unexpected stream chunk content: {content!r}")
+    
+    def get_history(self, session_id: Optional[str] = None, limit: int = 50, cursor: Optional[str] = None):
+        """Get one page of conversation history (pass the returned 'next' as cursor for older messages)"""
+        path = f"/history/{session_id}" if session_id else self._history_path
+        if not path:
             return {"error": "No session ID provided"}
         
-        response = requests.get(f"{self.base_url}/history/{sid}")
-        return response.json()
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        
+        response = self.http.get(path, params=params)
+        return orjson.loads(response.content)
     
     def get_session_info(self, session_id: Optional[str] = None):
         """Get session information"""
-        sid = session_id or self.session_id
-        if not sid:
+        path = f"/session/{session_id}" if session_id else self._session_path
+        if not path:
             return {"error": "No session ID provided"}
         
-        response = requests.get(f"{self.base_url}/session/{sid}")
-        return response.json()
+        response = self.http.get(path)
+        return orjson.loads(response.content)
     
     def list_sessions(self):
         """List all active sessions"""
-        response = requests.get(f"{self.base_url}/sessions")
-        return response.json()
+        response = self.http.get("/sessions")
+        return orjson.loads(response.content)
     
     def delete_session(self, session_id: Optional[str] = None):
         """Delete a session"""
-        sid = session_id or self.session_id
-        if not sid:
+        path = f"/session/{session_id}" if session_id else self._session_path
+        if not path:
             return {"error": "No session ID provided"}
         
-        response = requests.delete(f"{self.base_url}/session/{sid}")
-        return response.json()
+        response = self.http.delete(path)
+        return orjson.loads(response.content)
     
     def list_models(self):
-        """List available models"""
-        response = requests.post(f"{self.base_url}/models/list")
-        return response.json()
+        """List available models (cached for MODELS_CACHE_TTL seconds)"""
+        if self._models_cache is not None and monotonic() - self._models_cached_at < self.MODELS_CACHE_TTL:
+            return self._models_cache
+        
+        response = self.http.post("/models/list")
+        if response.status_code != 200:
+            return orjson.loads(response.content)
+        
+        self._models_cache = orjson.loads(response.content)
+        self._models_cached_at = monotonic()
+        return self._models_cache
 
 
 def demo_conversation():
@@ -117,7 +197,7 @@ def demo_conversation():
     # Get history
     print("\n5. Getting Conversation History")
     history = client.get_history()
-    print(f"   Total messages: {len(history)}")
+    print(f"   Total messages: {len(history.get('items', []))}")
     
     print("\n" + "=" * 60)
     print("Demo Complete!")
@@ -134,15 +214,19 @@ def demo_multiple_sessions():
     client1 = ChatbotAPIClient()
     client2 = ChatbotAPIClient()
     
+    # Both sessions are independent, so send their first messages at the same time
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        f1 = executor.submit(client1.send_message, "Tell me about AWS Lambda")
+        f2 = executor.submit(client2.send_message, "Tell me about AWS DynamoDB")
+        r1, r2 = f1.result(), f2.result()
+    
     # Session 1
     print("\n📝 Session 1:")
-    r1 = client1.send_message("Tell me about AWS Lambda")
     print(f"   Session ID: {r1.get('session_id')}")
     print(f"   Response: {r1.get('response')[:80]}...")
     
     # Session 2
     print("\n📝 Session 2:")
-    r2 = client2.send_message("Tell me about AWS DynamoDB")
     print(f"   Session ID: {r2.get('session_id')}")
     print(f"   Response: {r2.get('response')[:80]}...")
     
@@ -208,10 +292,12 @@ def interactive_mode():
             break
         
         if user_input.lower() == 'history':
-            history = client.get_history()
-            print(f"\n📜 Conversation History ({len(history)} messages):")
-            for item in history:
-                print(f"  [{item['timestamp']}] {item['role']}: {item['content'][:60]}...")
+            history = client.get_history().get('items', [])
+            # Header and messages in one write
+            print("\n".join([f"\n📜 Conversation History ({len(history)} messages):"] + [
+                f"  [{item['timestamp']}] {item['role']}: {item['content'][:60]}..."
+                for item in history
+            ]))
             continue
         
         if user_input.lower() == 'info':
@@ -228,13 +314,14 @@ def interactive_mode():
             print("✨ Started new session")
             continue
         
-        # Send message
-        response = client.send_message(user_input)
-        
-        if "error" in response:
-            print(f"\n❌ Error: {response['error']}")
-        else:
-            print(f"\n🤖 Assistant: {response['response']}")
+        # Send message and print the reply as it streams in
+        try:
+            print("\n🤖 Assistant: ", end="", flush=True)
+            for chunk in client.send_message(user_input, stream=True):
+                print(chunk, end="", flush=True)
+            print()
+        except (httpx.HTTPError, RuntimeError) as e:
+            print(f"\n❌ Error: {e}")
 
 
 if __name__ == "__main__":